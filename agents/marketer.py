@@ -5,8 +5,18 @@
 공식 문서: https://docs.tweepy.org/en/stable/client.html#create-tweet
 """
 
+import atexit
+import functools
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
 import requests
 import tweepy
+from requests.adapters import HTTPAdapter
 from config import (
     X_API_KEY,
     X_API_SECRET,
@@ -18,12 +28,69 @@ from config import (
 from safety import tracker
 
 
+# 출력 경로는 모듈 로드 시 1회만 계산 (호출마다 dirname 체인 재계산 방지)
+_REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_DOCS_DIR = os.path.join(_REPO_ROOT, "docs")
+
+# 게시 이력 (재실행 시 동일 콘텐츠 중복 게시 방지, 7일 지나면 재게시 허용)
+_POSTED_LOG_PATH = os.path.join(_REPO_ROOT, "data", "posted.json")
+_POSTED_TTL_SECONDS = 7 * 24 * 60 * 60
+
+# 모듈 공용 HTTP 세션: 호출마다 TCP+TLS 핸드셰이크를 새로 하지 않도록 커넥션 풀 재사용
+_session = requests.Session()
+_session.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=8, max_retries=1))
+atexit.register(_session.close)
+
+
+def _load_posted_log() -> dict:
+    try:
+        with open(_POSTED_LOG_PATH, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _already_posted(key: str) -> bool:
+    ts = _load_posted_log().get(key)
+    return ts is not None and time.time() - ts < _POSTED_TTL_SECONDS
+
+
+def _record_posted(key: str) -> None:
+    now = time.time()
+    # TTL이 지난 항목은 정리하면서 기록
+    posted = {k: v for k, v in _load_posted_log().items() if now - v < _POSTED_TTL_SECONDS}
+    posted[key] = now
+
+    os.makedirs(os.path.dirname(_POSTED_LOG_PATH), exist_ok=True)
+    tmp_path = _POSTED_LOG_PATH + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(posted, f)
+    os.replace(tmp_path, _POSTED_LOG_PATH)
+
+
+@functools.lru_cache(maxsize=1)
+def _get_twitter_client() -> tweepy.Client:
+    """인증된 tweepy.Client를 1회만 생성해 재사용합니다 (호출마다 재인증 방지)."""
+    return tweepy.Client(
+        consumer_key=X_API_KEY,
+        consumer_secret=X_API_SECRET,
+        access_token=X_ACCESS_TOKEN,
+        access_token_secret=X_ACCESS_TOKEN_SECRET,
+    )
+
+
 def post_to_twitter(summary: str, slug: str) -> bool:
     """tweepy.Client.create_tweet() - 트윗 게시"""
     if not all([X_API_KEY, X_API_SECRET, X_ACCESS_TOKEN, X_ACCESS_TOKEN_SECRET]):
         print("[마케터] 경고: X API 인증 정보가 불완전합니다. 트윗 게시를 건너뜁니다.")
         return False
 
+    # 크론 재실행/수동 재시도 시 동일 글을 다시 트윗하지 않음 (스팸/쿼터 보호)
+    posted_key = hashlib.sha256(f"{slug}|{summary}|twitter".encode()).hexdigest()
+    if _already_posted(posted_key):
+        print("[마케터] 동일 콘텐츠가 이미 게시됨 (7일 내). 트윗을 건너뜁니다.")
+        return True
+
     blog_url = f"{BLOG_BASE_URL}/{slug}.html"
     tweet_text = f"{summary}\n\nRead more: {blog_url}"
 
@@ -31,17 +98,13 @@ def post_to_twitter(summary: str, slug: str) -> bool:
         max_summary_len = 280 - len(f"\n\nRead more: {blog_url}") - 3
         tweet_text = f"{summary[:max_summary_len]}...\n\nRead more: {blog_url}"
 
-    client = tweepy.Client(
-        consumer_key=X_API_KEY,
-        consumer_secret=X_API_SECRET,
-        access_token=X_ACCESS_TOKEN,
-        access_token_secret=X_ACCESS_TOKEN_SECRET,
-    )
+    client = _get_twitter_client()
 
     try:
         response = client.create_tweet(text=tweet_text)
         tracker.log_api_call("twitter_write")
         tweet_id = response.data["id"]
+        _record_posted(posted_key)
         print(f"[마케터] 트윗 게시 성공!")
         print(f"  - 트윗 ID: {tweet_id}")
         print(f"  - URL: https://x.com/i/status/{tweet_id}")
@@ -52,35 +115,33 @@ def post_to_twitter(summary: str, slug: str) -> bool:
         return False
 
 
-def ping_google_indexing(slug: str) -> bool:
-    """구글/Bing에 새 페이지 색인 요청"""
-    page_url = f"{BLOG_BASE_URL}/{slug}.html"
-    sitemap_url = f"{BLOG_BASE_URL}/sitemap.xml"
-    success = False
+def ping_google_indexing(slugs: str | list[str]) -> bool:
+    """검색 엔진에 새 페이지 색인 요청 (IndexNow)
 
-    # Google Sitemap Ping
-    try:
-        resp = requests.get(f"https://www.google.com/ping?sitemap={sitemap_url}", timeout=15)
-        tracker.log_api_call("google_index")
-        if resp.status_code == 200:
-            print("[마케터] Google sitemap ping 성공!")
-            success = True
-        else:
-            print(f"[마케터] Google ping 응답 코드: {resp.status_code}")
-    except requests.RequestException as e:
-        tracker.log_error("other")
-        print(f"[마케터] Google ping 실패: {e}")
+    IndexNow는 urlList에 최대 1만 개 URL을 담을 수 있으므로 슬러그가
+    여러 개여도 HTTPS 왕복 1회로 묶어 전송합니다 (슬러그당 1회 호출 금지).
+
+    Google sitemap ping(google.com/ping)은 2023년 6월에 폐기되어 404만
+    반환하므로 호출하지 않습니다. Google은 sitemap.xml 재수집으로 반영됩니다.
+    """
+    if isinstance(slugs, str):
+        slugs = [slugs]
+    if not slugs:
+        return False
+
+    page_urls = [f"{BLOG_BASE_URL}/{slug}.html" for slug in slugs]
+    success = False
 
-    # IndexNow (Bing, Yandex)
+    # IndexNow (Bing, Yandex) - URL 목록 전체를 단일 요청으로 일괄 제출
     try:
         indexnow_payload = {
             "host": BLOG_BASE_URL.replace("https://", "").replace("http://", ""),
-            "urlList": [page_url],
+            "urlList": page_urls,
         }
-        resp = requests.post("https://api.indexnow.org/indexnow", json=indexnow_payload, timeout=15)
+        resp = _session.post("https://api.indexnow.org/indexnow", json=indexnow_payload, timeout=15)
         tracker.log_api_call("indexnow")
         if resp.status_code in (200, 202):
-            print("[마케터] IndexNow 색인 요청 성공!")
+            print(f"[마케터] IndexNow 색인 요청 성공! ({len(page_urls)}개 URL)")
             success = True
         else:
             print(f"[마케터] IndexNow 응답 코드: {resp.status_code}")
@@ -89,7 +150,8 @@ def ping_google_indexing(slug: str) -> bool:
         print(f"[마케터] IndexNow 요청 실패: {e}")
 
     if success:
-        print(f"  - 색인 요청 URL: {page_url}")
+        for page_url in page_urls:
+            print(f"  - 색인 요청 URL: {page_url}")
     else:
         print("[마케터] 색인 요청이 모두 실패했지만, 글은 정상적으로 발행되었습니다.")
 
@@ -113,67 +175,77 @@ def distribute_to_channels(title: str, summary: str, slug: str) -> int:
         return 0
 
     blog_url = f"{BLOG_BASE_URL}/{slug}.html"
-    success_count = 0
+    payload = {
+        "title": title,
+        "summary": summary,
+        "url": blog_url,
+    }
 
-    for ch in channels:
+    def _post_one(ch: dict) -> bool:
         name = ch.get("name", "unknown")
         api_key = ch.get("api_key", "")
         endpoint = ch.get("endpoint", "")
 
         if not endpoint or not api_key:
             print(f"[마케터] 채널 '{name}' 설정 불완전. 건너뜁니다.")
-            continue
+            return False
 
         try:
-            payload = {
-                "title": title,
-                "summary": summary,
-                "url": blog_url,
-            }
             headers = {
                 "Authorization": f"Bearer {api_key}",
                 "Content-Type": "application/json",
             }
-            resp = requests.post(endpoint, json=payload, headers=headers, timeout=15)
+            resp = _session.post(endpoint, json=payload, headers=headers, timeout=15)
             tracker.log_api_call("twitter_write")
 
             if resp.status_code in (200, 201, 202):
                 print(f"[마케터] 채널 '{name}' 배포 성공!")
-                success_count += 1
-            else:
-                print(f"[마케터] 채널 '{name}' 응답 코드: {resp.status_code}")
+                return True
+            print(f"[마케터] 채널 '{name}' 응답 코드: {resp.status_code}")
         except requests.RequestException as e:
             tracker.log_error("other")
             print(f"[마케터] 채널 '{name}' 배포 실패: {e}")
+        return False
+
+    # 채널별 POST는 서로 독립적인 네트워크 대기이므로 스레드 풀로 동시 전송
+    with ThreadPoolExecutor(max_workers=min(len(channels), 8)) as executor:
+        success_count = sum(executor.map(_post_one, channels))
 
     print(f"[마케터] 멀티 채널 배포 결과: {success_count}/{len(channels)} 성공")
     return success_count
 
 
 def update_sitemap(all_slugs: list[str]) -> None:
-    import os
-    from datetime import datetime, timezone
-
     today = datetime.now(timezone.utc).strftime("%Y-%m-%d")
-    output_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), "docs")
-
-    urls_xml = ""
-    for slug in all_slugs:
-        urls_xml += f"""  <url>
-    <loc>{BLOG_BASE_URL}/{slug}.html</loc>
-    <lastmod>{today}</lastmod>
+    sitemap_path = os.path.join(_DOCS_DIR, "sitemap.xml")
+    tmp_path = sitemap_path + ".tmp"
+
+    # 전체 XML을 메모리에 조립하지 않고 URL 블록 단위로 스트리밍 기록
+    # (슬러그 수천 개 규모에서도 메모리 사용량이 일정)
+    # 임시 파일에 쓴 뒤 os.replace로 원자적 교체 — 중간에 죽어도 기존 사이트맵 유지
+    base_url = BLOG_BASE_URL
+    with open(tmp_path, "w", encoding="utf-8", buffering=1 << 16) as f:
+        f.write('<?xml version="1.0" encoding="UTF-8"?>\n')
+        f.write('<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n')
+        for slug in all_slugs:
+            # <lastmod>은 파일 mtime 기준 — 바뀌지 않은 글을 "오늘 수정"으로
+            # 표시하지 않아 크롤러의 불필요한 재수집을 줄임
+            try:
+                mtime = os.stat(os.path.join(_DOCS_DIR, f"{slug}.html")).st_mtime
+                lastmod = datetime.fromtimestamp(mtime, timezone.utc).strftime("%Y-%m-%d")
+            except OSError:
+                lastmod = today
+            f.write(
+                f"""  <url>
+    <loc>{base_url}/{slug}.html</loc>
+    <lastmod>{lastmod}</lastmod>
     <changefreq>daily</changefreq>
   </url>
 """
+            )
+        f.write("</urlset>")
 
-    sitemap = f"""<?xml version="1.0" encoding="UTF-8"?>
-<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">
-{urls_xml}</urlset>"""
-
-    sitemap_path = os.path.join(output_dir, "sitemap.xml")
-    with open(sitemap_path, "w", encoding="utf-8") as f:
-        f.write(sitemap)
-
+    os.replace(tmp_path, sitemap_path)
     print(f"[마케터] sitemap.xml 업데이트 완료 ({len(all_slugs)}개 URL)")
 
 
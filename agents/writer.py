@@ -5,16 +5,80 @@
 공식 문서: https://ai.google.dev/gemini-api/docs
 """
 
+import atexit
+import functools
+import hashlib
+import json
 import os
+import random
 import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone
+from string import Template
 from urllib.parse import quote_plus
 from google import genai  # google-genai 패키지 (신규)
+from google.genai import types
 from config import GEMINI_API_KEY, AMAZON_TAG, GEMINI_DAILY_CALL_LIMIT
 from safety import tracker
 
 
+# 출력 경로는 모듈 로드 시 1회만 계산 (호출마다 dirname 체인 재계산 방지)
+_REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_DOCS_DIR = os.path.join(_REPO_ROOT, "docs")
+
+# 프롬프트 해시 → 응답 디스크 캐시 (재실행/재시도 시 동일 프롬프트 과금 방지)
+_GEMINI_MODEL = "gemini-2.5-pro"
+_GEMINI_CACHE_DIR = os.path.join(_REPO_ROOT, "data", "gemini_cache")
+_GEMINI_CACHE_TTL_SECONDS = 24 * 60 * 60
+
 _gemini_call_count = 0
+# 한도 검사와 증가를 원자적으로 묶는 락 (스레드에서 호출돼도 한도 초과 방지)
+_gemini_lock = threading.Lock()
+
+# 디스크 쓰기를 호출자와 분리하는 백그라운드 쓰기 풀 (종료 시 플러시 보장)
+_write_executor = ThreadPoolExecutor(max_workers=2)
+atexit.register(_write_executor.shutdown)
+
+
+def _write_atomic(path: str, *parts: str) -> None:
+    """임시 파일에 조각을 순서대로 쓴 뒤 os.replace로 원자적 교체합니다."""
+    tmp_path = path + ".tmp"
+    try:
+        with open(tmp_path, "w", encoding="utf-8", buffering=1 << 16) as f:
+            for part in parts:
+                f.write(part)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        print(f"[작가] 파일 저장 실패 ({path}): {e}")
+
+
+# 일시적 오류로 보고 재시도할 HTTP 상태 코드
+_RETRYABLE_CODES = frozenset({429, 500, 502, 503, 504})
+
+
+def _retry_transient(fn, what: str, attempts: int = 4):
+    """429/5xx 일시 오류에 지수 백오프 + 지터로 재시도합니다. 그 외 오류는 즉시 전파."""
+    for attempt in range(1, attempts + 1):
+        try:
+            return fn()
+        except Exception as e:
+            code = getattr(e, "code", None) or getattr(e, "status_code", None)
+            if attempt == attempts or code not in _RETRYABLE_CODES:
+                raise
+            delay = min(2 ** attempt, 30) * (0.5 + random.random() / 2)
+            print(f"[작가] {what} 일시 오류 (code={code}). {delay:.1f}초 후 재시도 ({attempt}/{attempts - 1})")
+            time.sleep(delay)
+
+
+@functools.lru_cache(maxsize=1)
+def _get_gemini_client() -> genai.Client:
+    """genai.Client를 1회만 생성해 재사용합니다 (자격 증명 로드 + TLS 설정 비용 상각).
+
+    genai.Client() - Vertex AI 기반 인증 (Google Cloud 크레딧 사용)
+    """
+    return genai.Client(vertexai=True, project="fashion-money-maker", location="us-central1")
 
 
 def _check_gemini_limit() -> bool:
@@ -25,65 +89,131 @@ def _check_gemini_limit() -> bool:
     return True
 
 
-def _call_gemini(client, prompt: str) -> str:
-    """Gemini API 호출 + 사용량 기록"""
+def _call_gemini(client, prompt: str, json_mode: bool = False) -> str:
+    """Gemini API 호출 + 사용량 기록 (동일 프롬프트는 24시간 디스크 캐시 재사용)"""
     global _gemini_call_count
 
-    if not _check_gemini_limit():
-        return ""
-
-    _gemini_call_count += 1
-    print(f"[작가] Gemini API 호출 {_gemini_call_count}/{GEMINI_DAILY_CALL_LIMIT}")
+    key = hashlib.sha1(f"{_GEMINI_MODEL}\0{int(json_mode)}\0{prompt}".encode()).hexdigest()
+    cache_path = os.path.join(_GEMINI_CACHE_DIR, f"{key}.json")
+    try:
+        if time.time() - os.stat(cache_path).st_mtime < _GEMINI_CACHE_TTL_SECONDS:
+            with open(cache_path, encoding="utf-8") as f:
+                text = json.load(f)["text"]
+            print("[작가] Gemini 캐시 적중 - API 호출을 건너뜁니다.")
+            return text
+    except (OSError, ValueError, KeyError):
+        pass  # 캐시 미스 또는 손상 → 정상 호출 경로
+
+    with _gemini_lock:
+        if not _check_gemini_limit():
+            return ""
+        _gemini_call_count += 1
+        call_number = _gemini_call_count
+
+    print(f"[작가] Gemini API 호출 {call_number}/{GEMINI_DAILY_CALL_LIMIT}")
 
     # client.models.generate_content() - Gemini API v1 텍스트 생성
-    response = client.models.generate_content(
-        model="gemini-2.5-pro",
-        contents=prompt,
+    # json_mode: 구조화 출력(JSON) 강제 → 코드펜스 제거 등 후처리 불필요
+    config = (
+        types.GenerateContentConfig(response_mime_type="application/json")
+        if json_mode
+        else None
+    )
+    response = _retry_transient(
+        lambda: client.models.generate_content(
+            model=_GEMINI_MODEL,
+            contents=prompt,
+            config=config,
+        ),
+        "Gemini 호출",
     )
     tracker.log_api_call("gemini")
-    return response.text
+    text = response.text
 
+    if text:
+        os.makedirs(_GEMINI_CACHE_DIR, exist_ok=True)
+        with open(cache_path, "w", encoding="utf-8") as f:
+            json.dump({"text": text}, f, ensure_ascii=False)
 
-def _make_amazon_link(keyword: str) -> str:
-    encoded = quote_plus(keyword)
-    return f"https://www.amazon.com/s?k={encoded}&tag={AMAZON_TAG}"
+    return text
 
 
-def generate_blog_post(keywords: list[dict]) -> dict:
-    """키워드 → Gemini로 블로그 글 생성 → HTML 파일 저장"""
-    keyword_names = [kw["keyword"] for kw in keywords]
-    amazon_links = {kw: _make_amazon_link(kw) for kw in keyword_names}
-    links_text = "\n".join(f"- {kw}: {url}" for kw, url in amazon_links.items())
+# 동일 키워드 반복 인코딩을 피하기 위한 캐시 (사이트맵 재생성 시 키워드가 반복됨)
+_quote_plus = functools.lru_cache(maxsize=1024)(quote_plus)
+
+# 본문 후처리용 정규식 (호출마다 re 캐시를 거치지 않도록 모듈 레벨에서 1회 컴파일)
+_H1_RE = re.compile(r"<h1[^>]*>(.*?)</h1>", re.IGNORECASE)
+_TAG_RE = re.compile(r"<[^>]+>")
+_SLUG_RE = re.compile(r"[^a-z0-9]+")
+
+# HTML 이스케이프: 특수문자 유무를 정규식 1회 스캔으로 확인하는 낙관적 빠른 경로
+_SPECIAL_RE = re.compile(r"[\"'&<>]")
+_ESC = {"&": "&amp;", "<": "&lt;", ">": "&gt;", '"': "&quot;", "'": "&#39;"}
+
 
-    # genai.Client() - Vertex AI 기반 인증 (Google Cloud 크레딧 사용)
-    client = genai.Client(vertexai=True, project="fashion-money-maker", location="us-central1")
+def _escape(s: str) -> str:
+    """HTML 특수문자를 이스케이프합니다. 특수문자가 없으면 원본을 그대로 반환합니다."""
+    m = _SPECIAL_RE.search(s)
+    if m is None:
+        return s
+    esc = _ESC
+    parts = [s[: m.start()]]
+    parts.extend(esc.get(ch, ch) for ch in s[m.start():])
+    return "".join(parts)
 
-    # Generate Imagen 4 Ultra Image
-    print("[작가] Imagen 4 Ultra로 커버 이미지 생성 중...")
-    image_url = ""
+
+# AMAZON_TAG는 모듈 상수이므로 정적 부분을 미리 구워 둔 템플릿
+_AMAZON_SEARCH_TMPL = "https://www.amazon.com/s?k=%s&tag=" + AMAZON_TAG
+
+
+def _make_amazon_link(keyword: str) -> str:
+    return _AMAZON_SEARCH_TMPL % _quote_plus(keyword)
+
+
+def _generate_cover_image(client, keyword: str, img_path: str) -> bool:
+    """Imagen 4 Ultra로 커버 이미지를 생성해 img_path에 저장합니다."""
     try:
-        from google.genai import types
-        img_response = client.models.generate_images(
-            model="imagen-4.0-ultra-generate-001",
-            prompt=f"A photorealistic fashion editorial magazine cover featuring {keyword_names[0]} fashion trend. Clean, modern, high-end Vogue style.",
-            config=types.GenerateImagesConfig(number_of_images=1, output_mime_type="image/jpeg", aspect_ratio="16:9")
+        img_response = _retry_transient(
+            lambda: client.models.generate_images(
+                model="imagen-4.0-ultra-generate-001",
+                prompt=f"A photorealistic fashion editorial magazine cover featuring {keyword} fashion trend. Clean, modern, high-end Vogue style.",
+                config=types.GenerateImagesConfig(number_of_images=1, output_mime_type="image/jpeg", aspect_ratio="16:9")
+            ),
+            "Imagen 호출",
         )
         if img_response.generated_images:
             image_data = img_response.generated_images[0].image.image_bytes
-            
-            # Save the image
-            today_str = datetime.now(timezone.utc).strftime("%Y-%m-%d")
-            slug_base = re.sub(r"[^a-z0-9]+", "-", keyword_names[0].lower()).strip("-")[:20]
-            img_filename = f"{today_str}-{slug_base}.jpg"
-            img_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), "docs", "images", "generated")
-            os.makedirs(img_dir, exist_ok=True)
-            
-            with open(os.path.join(img_dir, img_filename), "wb") as f:
+            with open(img_path, "wb") as f:
                 f.write(image_data)
-            image_url = f"/images/generated/{img_filename}"
-            print(f"[작가] 이미지 생성 완료: {image_url}")
+            return True
     except Exception as e:
         print(f"[작가] Imagen 4 API 오류: {e}")
+    return False
+
+
+def generate_blog_post(keywords: list[dict], return_html: bool = False) -> dict:
+    """키워드 → Gemini로 블로그 글 생성 → HTML 파일 저장
+
+    return_html=True일 때만 결과 dict에 전체 페이지 HTML("html")을 포함합니다.
+    기본값은 대용량 문자열을 들고 있지 않도록 파일 경로만 반환합니다.
+    """
+    keyword_names = [kw["keyword"] for kw in keywords]
+    amazon_links = {kw: _make_amazon_link(kw) for kw in keyword_names}
+    links_text = "\n".join(f"- {kw}: {url}" for kw, url in amazon_links.items())
+
+    client = _get_gemini_client()
+
+    # 이미지 파일명은 키워드+날짜로 결정적이므로 URL을 먼저 확정할 수 있고,
+    # 덕분에 Imagen 이미지 생성과 Gemini 본문 생성을 동시에 진행할 수 있다.
+    # (이미지 생성 실패 시 <img onerror> 폴백이 플레이스홀더를 띄움)
+    today_str = datetime.now(timezone.utc).strftime("%Y-%m-%d")
+    img_slug = _SLUG_RE.sub("-", keyword_names[0].lower()).strip("-")[:20]
+    img_filename = f"{today_str}-{img_slug}.jpg"
+    img_dir = os.path.join(_DOCS_DIR, "images", "generated")
+    os.makedirs(img_dir, exist_ok=True)
+    image_url = f"/images/generated/{img_filename}"
+
+    print("[작가] Imagen 4 Ultra 커버 이미지 + Gemini 본문 동시 생성 중...")
 
     prompt = f"""You are a professional fashion blogger writing for a US audience.
 
@@ -103,58 +233,77 @@ Write an engaging, SEO-optimized blog post about today's hottest fashion trends.
 6. Use a friendly, conversational tone
 7. Include an intro paragraph and a conclusion
 8. Use H2 subheadings for each trend
-9. Output pure HTML content (no ```html``` markers, no <html>/<head>/<body> tags - just the article content)
+9. The article must be pure HTML content (no ```html``` markers, no <html>/<head>/<body> tags - just the article content)
 10. Add a small disclaimer at the bottom: "This post contains affiliate links. We may earn a commission at no extra cost to you."
 11. Add this image right after the H1 title: <img src="{image_url}" onerror="this.src='https://placehold.co/600x400?text=Image_Fallback'"  alt="{keyword_names[0]} fashion trend" style="width:100%; border-radius:8px; margin: 20px 0;">
 
+**Output format:** Respond with a single JSON object with exactly two fields:
+- "article_html": the full article HTML described above
+- "tweet_summary": a compelling tweet promoting the post (max 250 characters, 2-3 relevant hashtags, plain text, no markdown)
+
 Write the blog post now:"""
 
-    try:
-        article_html = _call_gemini(client, prompt)
-        if not article_html:
+    # with 블록 종료 시 이미지 스레드가 합류되므로 조기 return에도 안전
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        img_future = executor.submit(
+            _generate_cover_image,
+            client,
+            keyword_names[0],
+            os.path.join(img_dir, img_filename),
+        )
+
+        try:
+            # 본문 + 트윗 요약을 JSON 1회 호출로 함께 생성 (왕복/쿼터 절반)
+            response_text = _call_gemini(client, prompt, json_mode=True)
+            if not response_text:
+                return {}
+        except Exception as e:
+            print(f"[작가] Gemini API 오류: {e}")
+            tracker.log_error("gemini")
             return {}
-    except Exception as e:
-        print(f"[작가] Gemini API 오류: {e}")
-        tracker.log_error("gemini")
+
+    try:
+        payload = json.loads(response_text)
+        if not isinstance(payload, dict):
+            # JSON 모드여도 최상위가 배열/문자열일 수 있음 → 폴백 경로로
+            raise ValueError("응답 최상위가 JSON 객체가 아님")
+        article_html = payload.get("article_html", "")
+        summary = (payload.get("tweet_summary") or "").strip()[:250]
+    except ValueError:
+        # JSON 파싱 실패 시 응답 전체를 본문으로 간주하고 요약은 폴백 사용
+        article_html = response_text
+        summary = ""
+
+    if not article_html:
         return {}
 
+    if img_future.result():
+        print(f"[작가] 이미지 생성 완료: {image_url}")
+
     # 제목 추출
-    title_match = re.search(r"<h1[^>]*>(.*?)</h1>", article_html, re.IGNORECASE)
+    title_match = _H1_RE.search(article_html)
     title = title_match.group(1) if title_match else f"Fashion Trends: {keyword_names[0].title()}"
-    title = re.sub(r"<[^>]+>", "", title)
+    title = _TAG_RE.sub("", title)
 
     # URL 슬러그
     today = datetime.now(timezone.utc).strftime("%Y-%m-%d")
-    slug_base = re.sub(r"[^a-z0-9]+", "-", title.lower()).strip("-")[:50]
+    slug_base = _SLUG_RE.sub("-", title.lower()).strip("-")[:50]
     slug = f"{today}-{slug_base}"
 
-    # 트위터 요약
-    summary_prompt = f"""Summarize this fashion blog post title in a compelling tweet (max 250 chars).
-Include 2-3 relevant hashtags. Do NOT use markdown.
-
-Title: {title}
-Keywords: {', '.join(keyword_names)}
-
-Tweet:"""
-
-    try:
-        summary = _call_gemini(client, summary_prompt)
-        summary = summary.strip()[:250] if summary else ""
-    except Exception:
-        tracker.log_error("gemini")
-        summary = ""
-
+    # 트위터 요약은 본문과 같은 호출에서 생성됨 — 비어 있으면 폴백 사용
     if not summary:
         summary = f"New fashion trends alert! {', '.join(keyword_names[:3])} #Fashion #Trending"
 
-    full_html = _wrap_in_html_page(title, article_html, today)
+    header = _page_header(title, today)
+    footer = _page_footer(today)
 
-    output_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), "docs")
+    output_dir = _DOCS_DIR
     os.makedirs(output_dir, exist_ok=True)
     file_path = os.path.join(output_dir, f"{slug}.html")
 
-    with open(file_path, "w", encoding="utf-8") as f:
-        f.write(full_html)
+    # 머리글/본문/바닥글을 백그라운드 스레드에서 원자적으로 기록 —
+    # 호출자는 디스크를 기다리지 않고 다음 단계(사이트맵/홍보)로 진행
+    _write_executor.submit(_write_atomic, file_path, header, article_html, footer)
 
     print(f"[작가] 블로그 글 생성 완료!")
     print(f"  - 제목: {title}")
@@ -162,26 +311,29 @@ Tweet:"""
     print(f"  - 요약: {summary}")
     print(f"  - Gemini API 총 호출: {_gemini_call_count}회")
 
-    return {
+    result = {
         "title": title,
         "slug": slug,
-        "html": full_html,
         "summary": summary,
         "file_path": file_path,
     }
+    if return_html:
+        result["html"] = header + article_html + footer
+    return result
 
 
-def _wrap_in_html_page(title: str, article_html: str, date: str) -> str:
-    return f"""<!DOCTYPE html>
+# 페이지 템플릿은 모듈 상수 1회 파싱 — string.Template은 $name 치환이라
+# CSS 중괄호를 f-string처럼 {{ }}로 이스케이프할 필요가 없음
+_PAGE_HEADER_TMPL = Template("""<!DOCTYPE html>
 <html lang="en">
 <head>
     <meta charset="UTF-8">
     <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>{title} | TrendLoop USA</title>
-    <meta name="description" content="{title} - Discover the latest fashion trends in the USA.">
+    <title>$title | TrendLoop USA</title>
+    <meta name="description" content="$title - Discover the latest fashion trends in the USA.">
     <style>
-        * {{ margin: 0; padding: 0; box-sizing: border-box; }}
-        body {{
+        * { margin: 0; padding: 0; box-sizing: border-box; }
+        body {
             font-family: 'Segoe UI', system-ui, -apple-system, sans-serif;
             line-height: 1.8;
             color: #333;
@@ -189,37 +341,47 @@ def _wrap_in_html_page(title: str, article_html: str, date: str) -> str:
             margin: 0 auto;
             padding: 20px;
             background: #fafafa;
-        }}
-        header {{
+        }
+        header {
             text-align: center;
             padding: 30px 0;
             border-bottom: 2px solid #e0e0e0;
             margin-bottom: 30px;
-        }}
-        header .brand {{ font-size: 14px; color: #888; text-transform: uppercase; letter-spacing: 2px; }}
-        header .date {{ font-size: 13px; color: #aaa; margin-top: 5px; }}
-        article h1 {{ font-size: 2em; margin: 20px 0; color: #1a1a1a; }}
-        article h2 {{ font-size: 1.4em; margin: 25px 0 10px; color: #2a2a2a; }}
-        article p {{ margin: 12px 0; }}
-        article a {{ color: #c0392b; text-decoration: none; font-weight: 500; }}
-        article a:hover {{ text-decoration: underline; }}
-        .disclaimer {{ margin-top: 40px; padding: 15px; background: #f0f0f0; border-radius: 8px; font-size: 13px; color: #777; }}
-        footer {{ text-align: center; margin-top: 50px; padding: 20px 0; font-size: 12px; color: #aaa; }}
+        }
+        header .brand { font-size: 14px; color: #888; text-transform: uppercase; letter-spacing: 2px; }
+        header .date { font-size: 13px; color: #aaa; margin-top: 5px; }
+        article h1 { font-size: 2em; margin: 20px 0; color: #1a1a1a; }
+        article h2 { font-size: 1.4em; margin: 25px 0 10px; color: #2a2a2a; }
+        article p { margin: 12px 0; }
+        article a { color: #c0392b; text-decoration: none; font-weight: 500; }
+        article a:hover { text-decoration: underline; }
+        .disclaimer { margin-top: 40px; padding: 15px; background: #f0f0f0; border-radius: 8px; font-size: 13px; color: #777; }
+        footer { text-align: center; margin-top: 50px; padding: 20px 0; font-size: 12px; color: #aaa; }
     </style>
 </head>
 <body>
     <header>
         <div class="brand">TrendLoop USA</div>
-        <div class="date">{date}</div>
+        <div class="date">$date</div>
     </header>
     <article>
-        {article_html}
+        """)
+
+_PAGE_FOOTER_TMPL = Template("""
     </article>
     <footer>
-        &copy; {date[:4]} TrendLoop USA. All rights reserved.
+        &copy; $year TrendLoop USA. All rights reserved.
     </footer>
 </body>
-</html>"""
+</html>""")
+
+
+def _page_header(title: str, date: str) -> str:
+    return _PAGE_HEADER_TMPL.substitute(title=_escape(title), date=date)
+
+
+def _page_footer(date: str) -> str:
+    return _PAGE_FOOTER_TMPL.substitute(year=date[:4])
 
 
 if __name__ == "__main__":
@@ -10,10 +10,10 @@ main.py - TrendLoop USA 오케스트레이터 (지휘자)
 """
 
 import os
-import glob
 import sys
 import signal
 import time
+from concurrent.futures import ThreadPoolExecutor
 
 sys.path.insert(0, os.path.dirname(__file__))
 
@@ -129,10 +129,13 @@ def main():
     print("-" * 40)
 
     docs_dir = os.path.join(os.path.dirname(__file__), "docs")
-    existing_files = glob.glob(os.path.join(docs_dir, "*.html"))
-    all_slugs = [
-        os.path.splitext(os.path.basename(f))[0] for f in existing_files
-    ]
+    # os.scandir: glob과 달리 항목별 stat 없이 디렉터리 1회 순회로 목록화
+    with os.scandir(docs_dir) as entries:
+        all_slugs = [
+            os.path.splitext(entry.name)[0]
+            for entry in entries
+            if entry.is_file() and entry.name.endswith(".html")
+        ]
     if blog["slug"] not in all_slugs:
         all_slugs.append(blog["slug"])
 
@@ -143,8 +146,12 @@ def main():
     print("[STEP 4] 에이전트 C (마케터) - 홍보 및 색인 중...")
     print("-" * 40)
 
-    tweet_ok = post_to_twitter(blog["summary"], blog["slug"])
-    index_ok = ping_google_indexing(blog["slug"])
+    # 트윗 게시와 색인 요청은 서로 독립적인 네트워크 대기 → 동시에 실행
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        tweet_future = executor.submit(post_to_twitter, blog["summary"], blog["slug"])
+        index_future = executor.submit(ping_google_indexing, blog["slug"])
+        tweet_ok = tweet_future.result()
+        index_ok = index_future.result()
 
     print()
 
@@ -10,6 +10,7 @@ safety.py - 파일 보호 + 비상 복구 + 실행 보고 시스템
 
 import os
 import shutil
+import threading
 import time
 from datetime import datetime, timezone
 
@@ -38,18 +39,23 @@ class UsageTracker:
             "other": 0,
         }
         self.consecutive_errors = 0
+        # 에이전트들이 스레드 풀에서 호출하므로 카운터 증가(읽기-수정-쓰기)를
+        # 락으로 묶음 — 이 수치가 is_abnormal의 API 지출 차단 기준이 됨
+        self._lock = threading.Lock()
 
     def log_api_call(self, service: str):
         """API 호출 1회 기록"""
-        if service in self.api_calls:
-            self.api_calls[service] += 1
-        self.consecutive_errors = 0  # 성공이면 리셋
+        with self._lock:
+            if service in self.api_calls:
+                self.api_calls[service] += 1
+            self.consecutive_errors = 0  # 성공이면 리셋
 
     def log_error(self, service: str):
         """에러 1회 기록"""
-        if service in self.errors:
-            self.errors[service] += 1
-        self.consecutive_errors += 1
+        with self._lock:
+            if service in self.errors:
+                self.errors[service] += 1
+            self.consecutive_errors += 1
 
     def is_abnormal(self, max_consecutive: int = 3) -> bool:
         """비정상 동작 여부 판단"""